@@ -1,19 +1,61 @@
 import pandas as pd
 import numpy as np
 
-def calculate_profit(row, selected_team):
+def team_win_masks(team_matches, home_is_us):
     """
-    Calculate profit based on betting on selected team to win
-    - If selected team plays HOME and wins (FTR='H'): profit using 1XBH odds
-    - If selected team plays AWAY and wins (FTR='A'): profit using 1XBA odds  
-    - If selected team loses or draws: -100 loss
+    Boolean arrays flagging matches selected team won, team_matches must only hold its matches
+    - home_is_us: selected team played HOME in each match, otherwise it played AWAY
+    - home_win: selected team played HOME and won (FTR='H')
+    - away_win: selected team played AWAY and won (FTR='A')
     """
-    if row['HomeTeam'] == selected_team and row['FTR'] == 'H':
-        # Our team played home and won
-        return ((100 * row['1XBH']) - 100)
-    elif row['AwayTeam'] == selected_team and row['FTR'] == 'A':
-        # Our team played away and won
-        return ((100 * row['1XBA']) - 100)
+    ftr = team_matches['FTR'].values
+    home_win = home_is_us & (ftr == 'H')
+    away_win = ~home_is_us & (ftr == 'A')
+    return home_win, away_win
+
+# Cash out strategies understood by simulate
+CASH_OUT_NONE = 0
+CASH_OUT_GAMES = 1
+CASH_OUT_THRESHOLD = 2
+
+# Reasons simulate stopped betting
+STOP_ALL_GAMES = 0
+STOP_BANKRUPT = 1
+STOP_GAMES = 2
+STOP_THRESHOLD = 3
+
+def simulate(home_win, away_win, odds, initial_budget, cash_out_type, cash_out_value):
+    """
+    Simulate betting the entire budget on selected team to win, match by match
+    - If selected team plays HOME and wins: budget multiplies by 1XBH odds
+    - If selected team plays AWAY and wins: budget multiplies by 1XBA odds
+    - If selected team loses or draws: budget drops to zero
+    odds holds one row per match with 1XBH and 1XBA as its two columns
+    Returns (budgets, profits, games_played, stop_code), arrays cut at games_played
+    """
+    multipliers = np.where(home_win, odds[:, 0], np.where(away_win, odds[:, 1], 0.0))
+    budgets_after = initial_budget * np.cumprod(multipliers)
+
+    # First game (1-based) at which each stop condition holds, len + 1 if never
+    never = len(multipliers) + 1
+    bankrupt = budgets_after <= 0
+    bankrupt_game = np.argmax(bankrupt) + 1 if bankrupt.any() else never
+    stop_game = never
+    if cash_out_type == CASH_OUT_GAMES:
+        stop_game = min(int(np.ceil(cash_out_value)), never)
+    elif cash_out_type == CASH_OUT_THRESHOLD:
+        reached = ((budgets_after - initial_budget) / initial_budget) * 100 >= cash_out_value
+        stop_game = np.argmax(reached) + 1 if reached.any() else never
+
+    # Going bankrupt takes precedence over cashing out on the same game
+    if bankrupt_game <= stop_game and bankrupt_game < never:
+        games_played, stop_code = bankrupt_game, STOP_BANKRUPT
+    elif stop_game < never:
+        games_played = stop_game
+        stop_code = STOP_GAMES if cash_out_type == CASH_OUT_GAMES else STOP_THRESHOLD
     else:
-        # Our team lost or drew
-        return -100
\ No newline at end of file
+        games_played, stop_code = len(multipliers), STOP_ALL_GAMES
+
+    budgets = np.concatenate(([initial_budget], budgets_after))[:games_played]
+    budgets_after = budgets_after[:games_played]
+    return budgets, budgets_after - budgets, games_played, stop_code